@@ -1,6 +1,6 @@
 from .abs import abs, abs_
 from .add import add, add_
-from .addmm import addmm
+from .addmm import addmm, addmm_gelu, addmm_relu
 from .all import all, all_dim, all_dims
 from .amax import amax
 from .any import any, any_dim, any_dims
@@ -180,6 +180,8 @@ __all__ = [
     "abs",
     "abs_",
     "addmm",
+    "addmm_relu",
+    "addmm_gelu",
     "arange",
     "arange_start",
     "batch_norm",
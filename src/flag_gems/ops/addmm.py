@@ -1,3 +1,4 @@
+import functools
 import logging
 
 import torch
@@ -6,15 +7,216 @@ import triton.language as tl
 
 from .. import runtime
 from ..runtime import torch_device_fn
-from ..utils import libentry
+from ..runtime.commom_utils import vendors
+from ..utils import libentry, pointwise_dynamic, tl_extra_shim
 from ..utils import triton_lang_extension as tle
 
+try:
+    # Host side TMA descriptors are available since Triton 3.1 (Hopper only).
+    from triton.tools.experimental_descriptor import create_2d_tma_descriptor
+
+    HAS_TMA_DESCRIPTOR = hasattr(tl, "_experimental_descriptor_load")
+except ImportError:
+    HAS_TMA_DESCRIPTOR = False
+
+tanh = tl_extra_shim.tanh
+
+
+@triton.jit
+def grouped_pid(pid, num_pid_m, num_pid_n, GROUP_SIZE_M: tl.constexpr):
+    # re-order program ID for better L2 performance
+    num_pid_in_group = GROUP_SIZE_M * num_pid_n
+    group_id = pid // num_pid_in_group
+    first_pid_m = group_id * GROUP_SIZE_M
+    group_size_m = min(num_pid_m - first_pid_m, GROUP_SIZE_M)
+    pid_m = first_pid_m + ((pid % num_pid_in_group) % group_size_m)
+    pid_n = (pid % num_pid_in_group) // group_size_m
+    return pid_m, pid_n
+
+
+@triton.jit
+def split_tf32(x):
+    # the tf32 representable head of x, with the remainder it drops
+    big = (x.to(tl.uint32, bitcast=True) & 0xFFFFE000).to(tl.float32, bitcast=True)
+    return big, x - big
+
+
+if int(triton.__version__[0]) >= 3:
+
+    @triton.jit
+    def dot_acc(a, b, acc, PRECISION: tl.constexpr):
+        if PRECISION == "tf32x3":
+            # 3xTF32 as CUTLASS does it: the three products run on tensor cores
+            # with independent accumulators and are summed on CUDA cores, small
+            # terms first, so the correction terms are not rounded away
+            a_big, a_small = split_tf32(a)
+            b_big, b_small = split_tf32(b)
+            big = tl.dot(a_big, b_big, input_precision="tf32", out_dtype=tl.float32)
+            small = tl.dot(a_big, b_small, input_precision="tf32", out_dtype=tl.float32)
+            small += tl.dot(
+                a_small, b_big, input_precision="tf32", out_dtype=tl.float32
+            )
+            acc += big + small
+        else:
+            acc = tl.dot(a, b, acc, input_precision=PRECISION, out_dtype=tl.float32)
+        return acc
+
+else:
+    # triton 2.x has no input_precision, only the allow_tf32 switch
+
+    @triton.jit
+    def dot_acc(a, b, acc, PRECISION: tl.constexpr):
+        if PRECISION == "tf32x3":
+            a_big, a_small = split_tf32(a)
+            b_big, b_small = split_tf32(b)
+            big = tl.dot(a_big, b_big, allow_tf32=True, out_dtype=tl.float32)
+            small = tl.dot(a_big, b_small, allow_tf32=True, out_dtype=tl.float32)
+            small += tl.dot(a_small, b_big, allow_tf32=True, out_dtype=tl.float32)
+            acc += big + small
+        else:
+            acc += tl.dot(a, b, allow_tf32=PRECISION != "ieee", out_dtype=tl.float32)
+        return acc
+
+
+@triton.jit
+def apply_activation(x, ACTIVATION: tl.constexpr):
+    # post-op fused into the epilogue, gelu is the tanh approximation
+    if ACTIVATION == "relu":
+        x = tl.maximum(x, 0.0)
+    elif ACTIVATION == "gelu":
+        x = x * 0.5 * (1.0 + tanh(0.79788456 * (x + 0.044715 * x * x * x)))
+    return x
+
+
+@triton.jit
+def load_bias(
+    bias_ptr, offs_m, offs_n, stride_biasm, stride_biasn, BIAS_ROW: tl.constexpr
+):
+    # a bias broadcast over the rows is loaded as a single (1, N) row, so the
+    # caller scales one row before it is broadcast to the tile
+    if BIAS_ROW:
+        bias = tl.load(bias_ptr + offs_n * stride_biasn)[None, :]
+    else:
+        bias = tl.load(
+            bias_ptr + (offs_m[:, None] * stride_biasm + offs_n[None, :] * stride_biasn)
+        )
+    return bias.to(tl.float32)
+
+
+# shared memory budget of one CTA, in bytes, when the device does not report it
+DEFAULT_SHARED_MEMORY_LIMIT = 100_000
+# fp32 accumulator registers a thread may hold, of the 255 it can address
+MAX_ACC_REGISTERS = 128
+# bytes of each operand row loaded per K step on nvidia, a 128 byte K tile
+# fills the widest shared memory swizzle for any input dtype
+K_TILE_BYTES = 128
+
+
+@functools.lru_cache(maxsize=None)
+def get_shared_memory_limit(device_index):
+    props = torch_device_fn.get_device_properties(device_index)
+    return getattr(props, "shared_memory_per_block_optin", DEFAULT_SHARED_MEMORY_LIMIT)
+
+
+@functools.lru_cache(maxsize=None)
+def get_num_sms(device_index):
+    return torch_device_fn.get_device_properties(device_index).multi_processor_count
+
+
+@functools.lru_cache(maxsize=None)
+def get_device_capability(device_index):
+    return torch_device_fn.get_device_capability(device_index)
+
+
+def fits_shared_memory(config, element_size, shared_memory_limit):
+    # the pipelined A and B tiles, the largest shared memory user of the kernels
+    BLOCK_SIZE_M = config.kwargs["BLOCK_SIZE_M"]
+    BLOCK_SIZE_N = config.kwargs["BLOCK_SIZE_N"]
+    BLOCK_SIZE_K = config.kwargs["BLOCK_SIZE_K"]
+    shared_memory = (
+        (BLOCK_SIZE_M * BLOCK_SIZE_K + BLOCK_SIZE_K * BLOCK_SIZE_N)
+        * config.num_stages
+        * element_size
+    )
+    return shared_memory <= shared_memory_limit
+
+
+def addmm_split_k_early_config_prune(configs, named_args, **kwargs):
+    # the split-k list mixes in deep K tiles that overflow shared memory for
+    # wider dtypes, skip them instead of failing to compile them
+    a = named_args["a_ptr"]
+    shared_memory_limit = get_shared_memory_limit(a.device.index)
+    pruned_configs = [
+        config
+        for config in configs
+        if fits_shared_memory(config, a.element_size(), shared_memory_limit)
+    ]
+    # never leave the autotuner without a candidate
+    return pruned_configs or configs
+
+
+def addmm_early_config_prune(configs, named_args, **kwargs):
+    # skip tiles much larger than the problem and tiles whose pipelined operand
+    # buffers cannot fit in shared memory. On nvidia the generated space is cut
+    # down further: one K tile per dtype, and for every M/N tile only the
+    # fewest warps whose accumulator does not spill out of registers.
+    M = named_args["M"]
+    N = named_args["N"]
+    a = named_args["a_ptr"]
+    shared_memory_limit = get_shared_memory_limit(a.device.index)
+    is_nvidia = runtime.device.vendor == vendors.NVIDIA
+
+    # the smallest tile along a dimension is always kept
+    min_block_m = min(config.kwargs["BLOCK_SIZE_M"] for config in configs)
+    configs = [
+        config
+        for config in configs
+        if config.kwargs["BLOCK_SIZE_M"] <= max(2 * M, min_block_m)
+    ]
+    min_block_n = min(config.kwargs["BLOCK_SIZE_N"] for config in configs)
+    configs = [
+        config
+        for config in configs
+        if config.kwargs["BLOCK_SIZE_N"] <= max(2 * N, min_block_n)
+    ]
+
+    element_size = a.element_size()
+    fitting_configs = [
+        config
+        for config in configs
+        if fits_shared_memory(config, element_size, shared_memory_limit)
+    ]
+    if not is_nvidia:
+        # never leave the autotuner without a candidate
+        return fitting_configs or configs
+
+    pruned_configs = []
+    for config in fitting_configs:
+        BLOCK_SIZE_M = config.kwargs["BLOCK_SIZE_M"]
+        BLOCK_SIZE_N = config.kwargs["BLOCK_SIZE_N"]
+        BLOCK_SIZE_K = config.kwargs["BLOCK_SIZE_K"]
+        if BLOCK_SIZE_K * element_size != K_TILE_BYTES:
+            continue
+        acc_registers = BLOCK_SIZE_M * BLOCK_SIZE_N // (config.num_warps * 32)
+        if acc_registers > MAX_ACC_REGISTERS:
+            continue
+        # half as many warps would hold this accumulator as well
+        if config.num_warps > 4 and acc_registers <= MAX_ACC_REGISTERS // 2:
+            continue
+        pruned_configs.append(config)
+    # the nvidia rules may reject a whole dtype, e.g. fp64 wants a K tile of 16
+    # that is not generated, fall back to what fits before the full list
+    return pruned_configs or fitting_configs or configs
+
 
 @libentry()
 @triton.autotune(
     configs=runtime.get_tuned_config("addmm"),
     key=["M", "N", "K"],
+    prune_configs_by={"early_config_prune": addmm_early_config_prune},
 )
+# strides stay out of do_not_specialize: triton compiles a stride of 1 as a
+# constant, so row-major operands get their address multiplies folded away
 @triton.jit(do_not_specialize=["alpha", "beta"])
 def addmm_kernel(
     a_ptr,
@@ -32,61 +234,410 @@ def addmm_kernel(
     stride_bn,
     stride_cm,
     stride_cn,
+    stride_biasm,
+    stride_biasn,
     BLOCK_SIZE_M: tl.constexpr,
     BLOCK_SIZE_N: tl.constexpr,
     BLOCK_SIZE_K: tl.constexpr,
+    PRECISION: tl.constexpr,
+    FOLD_BIAS: tl.constexpr,
+    BIAS_ROW: tl.constexpr,
+    # tuned on nvidia, the tune configs of other backends leave it out
+    GROUP_SIZE_M: tl.constexpr = 8,
+    ACTIVATION: tl.constexpr = "none",
 ):
-    pid_m = tle.program_id(0)
-    pid_n = tle.program_id(1)
+    pid = tle.program_id(0)
+    num_pid_m = tl.cdiv(M, BLOCK_SIZE_M)
+    num_pid_n = tl.cdiv(N, BLOCK_SIZE_N)
+    pid_m, pid_n = grouped_pid(pid, num_pid_m, num_pid_n, GROUP_SIZE_M)
 
-    offs_am = pid_m * BLOCK_SIZE_M + tl.arange(0, BLOCK_SIZE_M)
-    offs_bn = pid_n * BLOCK_SIZE_N + tl.arange(0, BLOCK_SIZE_N)
+    rm = pid_m * BLOCK_SIZE_M + tl.arange(0, BLOCK_SIZE_M)
+    rn = pid_n * BLOCK_SIZE_N + tl.arange(0, BLOCK_SIZE_N)
+    # wrap out of range rows and columns back into the matrix, so that tile
+    # loads need no M/N mask and can be vectorized
+    offs_am = tl.max_contiguous(tl.multiple_of(rm % M, BLOCK_SIZE_M), BLOCK_SIZE_M)
+    offs_bn = tl.max_contiguous(tl.multiple_of(rn % N, BLOCK_SIZE_N), BLOCK_SIZE_N)
     offs_k = tl.arange(0, BLOCK_SIZE_K)
     a_ptrs = a_ptr + (offs_am[:, None] * stride_am + offs_k[None, :] * stride_ak)
     b_ptrs = b_ptr + (offs_k[:, None] * stride_bk + offs_bn[None, :] * stride_bn)
-    bias_ptrs = bias_ptr + offs_bn
 
-    accumulator = tl.zeros((BLOCK_SIZE_M, BLOCK_SIZE_N), dtype=tl.float32)
+    if FOLD_BIAS:
+        # seed the accumulator with the scaled bias so that the epilogue reduces
+        # to a single scale: alpha * (A @ B + beta / alpha * bias)
+        bias = load_bias(
+            bias_ptr, offs_am, offs_bn, stride_biasm, stride_biasn, BIAS_ROW
+        )
+        accumulator = tl.broadcast_to(
+            bias * (beta / alpha), (BLOCK_SIZE_M, BLOCK_SIZE_N)
+        )
+    else:
+        accumulator = tl.zeros((BLOCK_SIZE_M, BLOCK_SIZE_N), dtype=tl.float32)
     for k in range(0, tl.cdiv(K, BLOCK_SIZE_K)):
         a = tl.load(
             a_ptrs,
-            mask=(offs_am[:, None] < M) & (offs_k[None, :] < K - k * BLOCK_SIZE_K),
+            mask=offs_k[None, :] < K - k * BLOCK_SIZE_K,
             other=0.0,
         )
         b = tl.load(
             b_ptrs,
-            mask=(offs_k[:, None] < K - k * BLOCK_SIZE_K) & (offs_bn[None, :] < N),
+            mask=offs_k[:, None] < K - k * BLOCK_SIZE_K,
             other=0.0,
         )
-        accumulator += tl.dot(a, b, allow_tf32=False)
+        accumulator = dot_acc(a, b, accumulator, PRECISION)
         a_ptrs += BLOCK_SIZE_K * stride_ak
         b_ptrs += BLOCK_SIZE_K * stride_bk
-    bias = tl.load(bias_ptrs, mask=offs_bn < N, other=0.0)
-    accumulator = accumulator * alpha + bias * beta
-    c = accumulator.to(bias.dtype)
-
-    offs_cm = pid_m * BLOCK_SIZE_M + tl.arange(0, BLOCK_SIZE_M)
-    offs_cn = pid_n * BLOCK_SIZE_N + tl.arange(0, BLOCK_SIZE_N)
-    c_ptrs = c_ptr + stride_cm * offs_cm[:, None] + stride_cn * offs_cn[None, :]
-    c_mask = (offs_cm[:, None] < M) & (offs_cn[None, :] < N)
+    c = accumulator * alpha
+    if not FOLD_BIAS:
+        # loaded only now, so it does not stay live across the K loop
+        bias = load_bias(
+            bias_ptr, offs_am, offs_bn, stride_biasm, stride_biasn, BIAS_ROW
+        )
+        c += bias * beta
+    # the bias may be kept in higher precision, the output follows the inputs
+    c = apply_activation(c, ACTIVATION).to(c_ptr.dtype.element_ty)
+
+    c_ptrs = c_ptr + stride_cm * rm[:, None] + stride_cn * rn[None, :]
+    c_mask = (rm[:, None] < M) & (rn[None, :] < N)
     tl.store(c_ptrs, c, mask=c_mask)
 
 
-def addmm(bias, mat1, mat2, *, beta=1, alpha=1):
-    logging.debug("GEMS ADDMM")
+@libentry()
+@triton.autotune(
+    configs=runtime.get_tuned_config("addmm_split_k"),
+    key=["M", "N", "K"],
+    prune_configs_by={"early_config_prune": addmm_split_k_early_config_prune},
+    reset_to_zero=["c_ptr"],
+)
+@triton.jit
+def addmm_split_k_kernel(
+    a_ptr,
+    b_ptr,
+    c_ptr,
+    M,
+    N,
+    K,
+    stride_am,
+    stride_ak,
+    stride_bk,
+    stride_bn,
+    stride_cm,
+    stride_cn,
+    BLOCK_SIZE_M: tl.constexpr,
+    BLOCK_SIZE_N: tl.constexpr,
+    BLOCK_SIZE_K: tl.constexpr,
+    SPLIT_K: tl.constexpr,
+    GROUP_SIZE_M: tl.constexpr,
+    PRECISION: tl.constexpr,
+):
+    # each program reduces every SPLIT_K-th K block of one output tile and
+    # accumulates its partial product into the fp32 workspace c
+    pid = tle.program_id(0)
+    pid_k = tle.program_id(1)
+    num_pid_m = tl.cdiv(M, BLOCK_SIZE_M)
+    num_pid_n = tl.cdiv(N, BLOCK_SIZE_N)
+    pid_m, pid_n = grouped_pid(pid, num_pid_m, num_pid_n, GROUP_SIZE_M)
+
+    rm = pid_m * BLOCK_SIZE_M + tl.arange(0, BLOCK_SIZE_M)
+    rn = pid_n * BLOCK_SIZE_N + tl.arange(0, BLOCK_SIZE_N)
+    # wrap out of range rows and columns back into the matrix, so that tile
+    # loads need no M/N mask and can be vectorized
+    offs_am = tl.max_contiguous(tl.multiple_of(rm % M, BLOCK_SIZE_M), BLOCK_SIZE_M)
+    offs_bn = tl.max_contiguous(tl.multiple_of(rn % N, BLOCK_SIZE_N), BLOCK_SIZE_N)
+    offs_k = pid_k * BLOCK_SIZE_K + tl.arange(0, BLOCK_SIZE_K)
+    a_ptrs = a_ptr + (offs_am[:, None] * stride_am + offs_k[None, :] * stride_ak)
+    b_ptrs = b_ptr + (offs_k[:, None] * stride_bk + offs_bn[None, :] * stride_bn)
+
+    accumulator = tl.zeros((BLOCK_SIZE_M, BLOCK_SIZE_N), dtype=tl.float32)
+    for k in range(0, tl.cdiv(K, BLOCK_SIZE_K * SPLIT_K)):
+        k_remaining = K - k * (BLOCK_SIZE_K * SPLIT_K)
+        a = tl.load(
+            a_ptrs,
+            mask=offs_k[None, :] < k_remaining,
+            other=0.0,
+        )
+        b = tl.load(
+            b_ptrs,
+            mask=offs_k[:, None] < k_remaining,
+            other=0.0,
+        )
+        accumulator = dot_acc(a, b, accumulator, PRECISION)
+        a_ptrs += BLOCK_SIZE_K * SPLIT_K * stride_ak
+        b_ptrs += BLOCK_SIZE_K * SPLIT_K * stride_bk
+
+    c_ptrs = c_ptr + stride_cm * rm[:, None] + stride_cn * rn[None, :]
+    c_mask = (rm[:, None] < M) & (rn[None, :] < N)
+    tl.atomic_add(c_ptrs, accumulator, mask=c_mask)
+
+
+@pointwise_dynamic(
+    is_tensor=[True, True, False, False], promotion_methods=[(0, 1, "DEFAULT")]
+)
+@triton.jit
+def addmm_split_k_epilogue(acc, bias, alpha, beta):
+    return acc * alpha + bias.to(tl.float32) * beta
+
+
+@pointwise_dynamic(
+    is_tensor=[True, True, False, False], promotion_methods=[(0, 1, "DEFAULT")]
+)
+@triton.jit
+def addmm_split_k_epilogue_relu(acc, bias, alpha, beta):
+    return apply_activation(acc * alpha + bias.to(tl.float32) * beta, "relu")
+
+
+@pointwise_dynamic(
+    is_tensor=[True, True, False, False], promotion_methods=[(0, 1, "DEFAULT")]
+)
+@triton.jit
+def addmm_split_k_epilogue_gelu(acc, bias, alpha, beta):
+    return apply_activation(acc * alpha + bias.to(tl.float32) * beta, "gelu")
+
+
+# pointwise_dynamic takes no constexpr arguments, so each post-op has its own
+SPLIT_K_EPILOGUES = {
+    "none": addmm_split_k_epilogue,
+    "relu": addmm_split_k_epilogue_relu,
+    "gelu": addmm_split_k_epilogue_gelu,
+}
+
+
+@triton.jit(do_not_specialize=["alpha", "beta"])
+def addmm_kernel_persistent_tma(
+    a_desc_ptr,
+    b_desc_ptr,
+    bias_ptr,
+    c_desc_ptr,
+    alpha,
+    beta,
+    M,
+    N,
+    K,
+    BLOCK_SIZE_M: tl.constexpr,
+    BLOCK_SIZE_N: tl.constexpr,
+    BLOCK_SIZE_K: tl.constexpr,
+    GROUP_SIZE_M: tl.constexpr,
+    PRECISION: tl.constexpr,
+    FOLD_BIAS: tl.constexpr,
+    NUM_SMS: tl.constexpr,
+    ACTIVATION: tl.constexpr = "none",
+):
+    # inputs, bias and output share one dtype on this path
+    dtype = bias_ptr.dtype.element_ty
+    start_pid = tle.program_id(0)
+    num_pid_m = tl.cdiv(M, BLOCK_SIZE_M)
+    num_pid_n = tl.cdiv(N, BLOCK_SIZE_N)
+    k_tiles = tl.cdiv(K, BLOCK_SIZE_K)
+    num_tiles = num_pid_m * num_pid_n
+
+    for tile_id in range(start_pid, num_tiles, NUM_SMS):
+        pid_m, pid_n = grouped_pid(tile_id, num_pid_m, num_pid_n, GROUP_SIZE_M)
+        offs_am = pid_m * BLOCK_SIZE_M
+        offs_bn = pid_n * BLOCK_SIZE_N
+
+        offs_n = offs_bn + tl.arange(0, BLOCK_SIZE_N)
+        bias = tl.load(bias_ptr + offs_n, mask=offs_n < N, other=0.0)
+        bias = bias.to(tl.float32)
+        if FOLD_BIAS:
+            bias_scaled = bias * (beta / alpha)
+            accumulator = tl.broadcast_to(
+                bias_scaled[None, :], (BLOCK_SIZE_M, BLOCK_SIZE_N)
+            )
+        else:
+            accumulator = tl.zeros((BLOCK_SIZE_M, BLOCK_SIZE_N), dtype=tl.float32)
+        for ki in range(0, k_tiles):
+            offs_k = ki * BLOCK_SIZE_K
+            # out of bound boxes are zero filled by the TMA unit
+            a = tl._experimental_descriptor_load(
+                a_desc_ptr, [offs_am, offs_k], [BLOCK_SIZE_M, BLOCK_SIZE_K], dtype
+            )
+            b = tl._experimental_descriptor_load(
+                b_desc_ptr, [offs_k, offs_bn], [BLOCK_SIZE_K, BLOCK_SIZE_N], dtype
+            )
+            accumulator = dot_acc(a, b, accumulator, PRECISION)
+        c = accumulator * alpha
+        if not FOLD_BIAS:
+            c += bias[None, :] * beta
+        c = apply_activation(c, ACTIVATION).to(dtype)
+        tl._experimental_descriptor_store(c_desc_ptr, c, [offs_am, offs_bn])
+
+
+# TMA descriptors are created on the host with the block shape baked in, so the
+# persistent kernel runs with a fixed tile per dtype instead of autotuning.
+PERSISTENT_TMA_CONFIGS = {
+    torch.float16: dict(
+        BLOCK_SIZE_M=128, BLOCK_SIZE_N=256, BLOCK_SIZE_K=64, num_stages=3, num_warps=8
+    ),
+    torch.bfloat16: dict(
+        BLOCK_SIZE_M=128, BLOCK_SIZE_N=256, BLOCK_SIZE_K=64, num_stages=3, num_warps=8
+    ),
+    torch.float32: dict(
+        BLOCK_SIZE_M=128, BLOCK_SIZE_N=128, BLOCK_SIZE_K=32, num_stages=3, num_warps=8
+    ),
+}
+
+
+def use_persistent_tma(bias, mat1, mat2):
+    if not HAS_TMA_DESCRIPTOR or runtime.device.vendor != vendors.NVIDIA:
+        return False
+    if get_device_capability(mat1.device.index) < (9, 0):
+        return False
+    dtype = mat1.dtype
+    if dtype not in PERSISTENT_TMA_CONFIGS or not (mat2.dtype == bias.dtype == dtype):
+        return False
+    # only a row vector bias, broadcast over the rows, is loaded as such
+    if bias.stride() != (0, 1):
+        return False
+    # the fixed tile is only a win when it alone fills every SM, smaller
+    # problems are left to the autotuned kernel
+    M, K = mat1.shape
+    _, N = mat2.shape
+    config = PERSISTENT_TMA_CONFIGS[dtype]
+    num_tiles = triton.cdiv(M, config["BLOCK_SIZE_M"]) * triton.cdiv(
+        N, config["BLOCK_SIZE_N"]
+    )
+    if num_tiles < get_num_sms(mat1.device.index):
+        return False
+    # the descriptors assume dense row-major operands, a sliced or broadcast
+    # row pitch is not expressible, and TMA needs it 16-byte aligned
+    return all(
+        t.stride(1) == 1
+        and t.stride(0) == t.shape[1]
+        and (t.stride(0) * t.element_size()) % 16 == 0
+        and t.data_ptr() % 16 == 0
+        for t in (mat1, mat2)
+    )
+
+
+def addmm_persistent_tma(bias, mat1, mat2, out, alpha, beta, activation):
+    M, K = mat1.shape
+    _, N = mat2.shape
+    config = PERSISTENT_TMA_CONFIGS[mat1.dtype]
+    BLOCK_SIZE_M = config["BLOCK_SIZE_M"]
+    BLOCK_SIZE_N = config["BLOCK_SIZE_N"]
+    BLOCK_SIZE_K = config["BLOCK_SIZE_K"]
+    element_size = mat1.element_size()
+    a_desc = create_2d_tma_descriptor(
+        mat1.data_ptr(), M, K, BLOCK_SIZE_M, BLOCK_SIZE_K, element_size
+    )
+    b_desc = create_2d_tma_descriptor(
+        mat2.data_ptr(), K, N, BLOCK_SIZE_K, BLOCK_SIZE_N, element_size
+    )
+    c_desc = create_2d_tma_descriptor(
+        out.data_ptr(), M, N, BLOCK_SIZE_M, BLOCK_SIZE_N, element_size
+    )
+    NUM_SMS = get_num_sms(mat1.device.index)
+    num_tiles = triton.cdiv(M, BLOCK_SIZE_M) * triton.cdiv(N, BLOCK_SIZE_N)
+    grid = (min(NUM_SMS, num_tiles),)
+    addmm_kernel_persistent_tma[grid](
+        a_desc,
+        b_desc,
+        bias,
+        c_desc,
+        alpha,
+        beta,
+        M,
+        N,
+        K,
+        GROUP_SIZE_M=8,
+        PRECISION=get_input_precision(mat1.dtype),
+        FOLD_BIAS=fold_bias(alpha, beta),
+        NUM_SMS=NUM_SMS,
+        ACTIVATION=activation,
+        **config,
+    )
+    return out
+
+
+def use_split_k(M, N, K, device):
+    # skinny outputs launch too few tiles to occupy every SM, so spread the
+    # K loop of each tile over extra programs when K is long enough to share
+    num_tiles = triton.cdiv(M, 128) * triton.cdiv(N, 128)
+    return num_tiles < get_num_sms(device.index) and K >= 1024
+
+
+def addmm_split_k(bias, mat1, mat2, out, alpha, beta, activation):
+    M, K = mat1.shape
+    _, N = mat2.shape
+    workspace = torch.zeros((M, N), device=mat1.device, dtype=torch.float32)
+    grid = lambda META: (
+        triton.cdiv(M, META["BLOCK_SIZE_M"]) * triton.cdiv(N, META["BLOCK_SIZE_N"]),
+        META["SPLIT_K"],
+    )
+    addmm_split_k_kernel[grid](
+        mat1,
+        mat2,
+        workspace,
+        M,
+        N,
+        K,
+        mat1.stride(0),
+        mat1.stride(1),
+        mat2.stride(0),
+        mat2.stride(1),
+        workspace.stride(0),
+        workspace.stride(1),
+        GROUP_SIZE_M=8,
+        PRECISION=get_input_precision(mat1.dtype),
+    )
+    epilogue = SPLIT_K_EPILOGUES[activation]
+    return epilogue(workspace, bias, alpha, beta, out0=out)
+
+
+def get_input_precision(dtype):
+    # fp32 inputs follow torch's float32 matmul precision setting on nvidia,
+    # fp16/bf16 inputs are fed to tensor cores as they are. Other backends
+    # may not lower tf32 dots, so they always stay on ieee.
+    if dtype != torch.float32 or runtime.device.vendor != vendors.NVIDIA:
+        return "ieee"
+    precision = torch.get_float32_matmul_precision()
+    if precision == "high":
+        return "tf32x3"
+    if precision == "medium":
+        return "tf32"
+    return "ieee"
+
+
+def fold_bias(alpha, beta):
+    # beta / alpha is computed in fp32 by the kernels, a tiny alpha may push it
+    # out of range where alpha * acc + beta * bias itself is fine
+    return abs(beta / alpha) <= torch.finfo(torch.float32).max
+
+
+def fused_addmm(bias, mat1, mat2, beta, alpha, activation):
     assert mat1.shape[1] == mat2.shape[0], "Incompatible dimensions"
+    assert mat1.dtype == mat2.dtype, "Incompatible dtypes"
     M, K = mat1.shape
     _, N = mat2.shape
+    # 0-dim, (N,), (1, N) and (M, N) biases all become an (M, N) view
+    bias = bias.broadcast_to((M, N))
 
-    mat1 = mat1.contiguous()
-    mat2 = mat2.contiguous()
+    if alpha == 0:
+        # the product term vanishes, and the kernel divides beta by alpha
+        out = (bias * beta).to(mat1.dtype).contiguous()
+        if activation == "relu":
+            return torch.relu(out)
+        if activation == "gelu":
+            return torch.nn.functional.gelu(out, approximate="tanh")
+        return out
+
+    # the kernel honors arbitrary strides, broadcast (stride 0) operands
+    # included, only copy when neither dim is dense
+    if mat1.stride(0) > 1 and mat1.stride(1) > 1:
+        mat1 = mat1.contiguous()
+    if mat2.stride(0) > 1 and mat2.stride(1) > 1:
+        mat2 = mat2.contiguous()
     out = torch.empty((M, N), device=mat1.device, dtype=mat1.dtype)
 
     grid = lambda META: (
-        triton.cdiv(M, META["BLOCK_SIZE_M"]),
-        triton.cdiv(N, META["BLOCK_SIZE_N"]),
+        triton.cdiv(M, META["BLOCK_SIZE_M"]) * triton.cdiv(N, META["BLOCK_SIZE_N"]),
     )
-    with torch_device_fn.device(mat1.device):
+    # one guard keyed by the device index covers every path, it skips the
+    # device parsing torch_device_fn.device repeats on each call
+    with torch_device_fn._DeviceGuard(mat1.device.index):
+        if use_split_k(M, N, K, mat1.device):
+            return addmm_split_k(bias, mat1, mat2, out, alpha, beta, activation)
+        if use_persistent_tma(bias, mat1, mat2):
+            return addmm_persistent_tma(bias, mat1, mat2, out, alpha, beta, activation)
         addmm_kernel[grid](
             mat1,
             mat2,
@@ -103,5 +654,27 @@ def addmm(bias, mat1, mat2, *, beta=1, alpha=1):
             mat2.stride(1),
             out.stride(0),
             out.stride(1),
+            bias.stride(0),
+            bias.stride(1),
+            PRECISION=get_input_precision(mat1.dtype),
+            FOLD_BIAS=fold_bias(alpha, beta),
+            BIAS_ROW=bias.stride(0) == 0,
+            ACTIVATION=activation,
         )
     return out
+
+
+def addmm(bias, mat1, mat2, *, beta=1, alpha=1):
+    logging.debug("GEMS ADDMM")
+    return fused_addmm(bias, mat1, mat2, beta, alpha, "none")
+
+
+def addmm_relu(bias, mat1, mat2, *, beta=1, alpha=1):
+    logging.debug("GEMS ADDMM RELU")
+    return fused_addmm(bias, mat1, mat2, beta, alpha, "relu")
+
+
+def addmm_gelu(bias, mat1, mat2, *, beta=1, alpha=1):
+    # gelu with the tanh approximation, as gelu(approximate="tanh")
+    logging.debug("GEMS ADDMM GELU")
+    return fused_addmm(bias, mat1, mat2, beta, alpha, "gelu")
@@ -1,5 +1,7 @@
+import atexit
 import inspect
-import sqlite3
+import os
+import pickle
 import threading
 import weakref
 from typing import Dict
@@ -11,16 +13,75 @@ from ..runtime import torch_device_fn
 from .code_cache import config_cache_dir
 
 DEVICE_COUNT = runtime.device.device_count
-ATTRS = {
-    (2, 2): 5,
-    (2, 3): 5,
-    (3, 0): 4,
-    (3, 1): 4,
-    (3, 2): 8,
-}
+DIVISIBILITY = 16
 version = triton.__version__.split(".")
 major_version, minor_version = eval(version[0]), eval(version[1])
 
+# Tuned configs of every LibTuner, {op name: {key: config row}}. A config row is
+# a plain dict holding the arguments of triton.Config, so that it can be loaded
+# without parsing. The cache file is read once per process and written back
+# once at exit.
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+_TUNERS = weakref.WeakSet()
+
+
+def _cache_path():
+    return config_cache_dir() / "TunedConfig.pkl"
+
+
+def _read_cache():
+    try:
+        with open(_cache_path(), "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+
+
+def _config_to_row(config):
+    row = {
+        "kwargs": dict(config.kwargs),
+        "num_warps": config.num_warps,
+        "num_stages": config.num_stages,
+        "num_ctas": config.num_ctas,
+    }
+    # maxnreg is only known to Triton 3.1 and later
+    if getattr(config, "maxnreg", None) is not None:
+        row["maxnreg"] = config.maxnreg
+    return row
+
+
+def _load_cache():
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = _read_cache()
+        return _CACHE
+
+
+@atexit.register
+def _store_cache():
+    with _CACHE_LOCK:
+        tuners = [tuner for tuner in _TUNERS if len(tuner.cache) != tuner.volumn]
+        if not tuners:
+            return
+        # merge into what is on disk now, other processes may have tuned too
+        cache = _read_cache()
+        for tuner in tuners:
+            table = cache.setdefault(tuner.__name__, {})
+            # many keys share one config, keep a single row object per config
+            rows = {}
+            for key, config in tuner.cache.items():
+                if key not in table:
+                    if id(config) not in rows:
+                        rows[id(config)] = _config_to_row(config)
+                    table[key] = rows[id(config)]
+        path = _cache_path()
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(cache, f)
+        os.replace(tmp_path, path)
+
 
 class LibTuner(triton.runtime.Autotuner):
     def __init__(
@@ -69,55 +130,18 @@ class LibTuner(triton.runtime.Autotuner):
                 use_cuda_graph,
             )
         self.__name__ = self.base_fn.__name__
-        self.cache_path = config_cache_dir() / "TunedConfig.db"
         self.preload()
-        weakref.finalize(self, self.store)
+        _TUNERS.add(self)
 
     def preload(self):
-        connect = sqlite3.connect(self.cache_path)
-        c = connect.cursor()
-        c.execute(
-            f"CREATE TABLE IF NOT EXISTS {self.__name__} (key TEXT PRIMARY KEY, config TEXT)"
-        )
-        cursor = c.execute(f"SELECT key, config from {self.__name__}")
-
-        for row in cursor:
-            key_str, config_str = row
-            key = [eval(k) for k in key_str[1:-1].split(", ")]
-
-            cfg_ls = [item.split(": ") for item in config_str.split(", ")]
-            kwargs = {}
-            numargs = {}
-            attrs = ATTRS[(major_version, minor_version)]
-            for k, v in cfg_ls[:-attrs]:
-                kwargs[k] = eval(v)
-            for k, v in cfg_ls[-attrs:]:
-                numargs[k] = eval(v)
-            # In Triton v2.2 and v2.3, enable_persistent is stored in config cache
-            # but not defined as initialization parameter
-            numargs.pop("enable_persistent", None)
-            config = triton.Config(kwargs, **numargs)
-            self.cache[tuple(key)] = config
-
-        connect.close()
-        self.volumn = len(self.cache)
+        # rows shared by several keys are turned into a single config
+        configs = {}
+        for key, row in _load_cache().get(self.__name__, {}).items():
+            if id(row) not in configs:
+                configs[id(row)] = triton.Config(**row)
+            self.cache[key] = configs[id(row)]
 
-    def store(self):
-        if len(self.cache) == self.volumn:
-            return
-        connect = sqlite3.connect(self.cache_path)
-        c = connect.cursor()
-        c.execute(
-            f"CREATE TABLE IF NOT EXISTS {self.__name__} (key TEXT PRIMARY KEY, config TEXT)"
-        )
-        for key, config in self.cache.items():
-            c.execute(
-                f"INSERT OR IGNORE INTO {self.__name__} (key, config) VALUES (?, ?)",
-                (str(key), config.__str__()),
-            )
-
-        connect.commit()
-        connect.close()
+        self.volumn = len(self.cache)
 
 
 def libtuner(
@@ -155,6 +179,26 @@ def libtuner(
     return decorator
 
 
+# Scalars are tested before probing for data_ptr, a failing hasattr is much more
+# expensive than isinstance and most kernel arguments are ints.
+def spec_arg_key(arg):
+    if isinstance(arg, (int, float)) or not hasattr(arg, "data_ptr"):
+        return (type(arg), arg)
+    return (arg.dtype, arg.data_ptr() % DIVISIBILITY == 0)
+
+
+def dns_arg_key(arg):
+    if not isinstance(arg, int):
+        if hasattr(arg, "data_ptr"):
+            return arg.dtype
+        return type(arg)
+    if -(2**31) <= arg <= 2**31 - 1:
+        return "i32"
+    if 2**63 <= arg <= 2**64 - 1:
+        return "u64"
+    return "i64"
+
+
 class LibEntry(triton.KernelInterface):
     def __init__(
         self,
@@ -162,61 +206,72 @@ class LibEntry(triton.KernelInterface):
     ):
         self.fn = fn
         self.arg_names = fn.arg_names
-        self.divisibility = 16
+        self.divisibility = DIVISIBILITY
         self.kernel_cache = tuple(dict() for _ in range(DEVICE_COUNT))
 
+        # the Autotuner/Heuristics wrappers from the outside in, the chain is
+        # fixed at decoration time so it is walked only once
+        self.runtime_fns = []
         while not isinstance(fn, triton.runtime.JITFunction):
+            if isinstance(fn, triton.runtime.Autotuner):
+                self.runtime_fns.append((fn, None))
+            elif isinstance(fn, triton.runtime.Heuristics):
+                self.runtime_fns.append((fn, list(fn.values.items())))
+            else:
+                raise RuntimeError("Invalid Runtime Function")
             fn = fn.fn
         self.jit_function: triton.runtime.JITFunction = fn
-        self.specialize_indices = [
-            p.num
+        self.default_constexprs = {
+            p.name: p.default
             for p in self.jit_function.params
-            if not p.is_constexpr and not p.do_not_specialize
-        ]
-        self.do_not_specialize_indices = [
-            p.num
+            if p.is_constexpr and p.default is not inspect._empty
+        }
+        # the kind of every parameter, resolved once instead of for every
+        # positional argument on every launch
+        self.arg_kinds = tuple(
+            "const" if p.is_constexpr else "dns" if p.do_not_specialize else "spec"
             for p in self.jit_function.params
-            if not p.is_constexpr and p.do_not_specialize
-        ]
+        )
         self.lock = threading.Lock()
 
-    def key(self, spec_args, dns_args, const_args):
-        def spec_arg(arg):
-            if hasattr(arg, "data_ptr"):
-                return (arg.dtype, arg.data_ptr() % self.divisibility == 0)
-            return (type(arg), arg)
-
-        def dns_arg(arg):
-            if hasattr(arg, "data_ptr"):
-                return arg.dtype
-            if not isinstance(arg, int):
-                return type(arg)
-            if -(2**31) <= arg and arg <= 2**31 - 1:
-                return "i32"
-            if 2**63 <= arg and arg <= 2**64 - 1:
-                return "u64"
-            return "i64"
-
-        spec_key = [spec_arg(arg) for arg in spec_args]
-        dns_key = [dns_arg(arg) for arg in dns_args]
+    def key(self, spec_key, dns_key, const_args):
+        # spec_key and dns_key are keyed while run() collects the arguments,
         # const args passed by position
         return tuple(spec_key + dns_key + const_args)
 
+    def collect_constexprs(self, args, kwargs):
+        # collect constexpr arguments for grid computation
+        constexprs = {}
+        for fn, heuristics in self.runtime_fns:
+            if heuristics is None:
+                config = fn.best_config
+                constexprs["num_warps"] = config.num_warps
+                constexprs["num_stages"] = config.num_stages
+                constexprs["num_ctas"] = config.num_ctas
+                constexprs.update(config.kwargs)
+            else:
+                named_args = {**dict(zip(fn.arg_names, args)), **kwargs}
+                for v, heur in heuristics:
+                    constexprs[v] = heur({**named_args, **constexprs})
+        for name, default in self.default_constexprs.items():
+            constexprs.setdefault(name, default)
+        return constexprs
+
     def run(self, *args, **kwargs):
         grid = kwargs["grid"]
 
         # collect all the arguments
-        spec_args = []  # specialize arguments
-        dns_args = []  # do not specialize arguments
+        spec_key = []  # keys of specialize arguments
+        dns_key = []  # keys of do not specialize arguments
         const_args = []  # constexpr arguments
         k_args = []  # kernel arguments
-        for i, arg in enumerate(args):
-            if i in self.specialize_indices:
+        for arg, kind in zip(args, self.arg_kinds):
+            if kind == "spec":
                 k_args.append(arg)
-                spec_args.append(arg)
-            elif i in self.do_not_specialize_indices:
+                spec_key.append(spec_arg_key(arg))
+            elif kind == "dns":
                 k_args.append(arg)
-                dns_args.append(arg)
+                dns_key.append(dns_arg_key(arg))
             else:
                 const_args.append(arg)
         for p in self.jit_function.params[len(args) :]:
@@ -230,55 +285,30 @@ class LibEntry(triton.KernelInterface):
             if p.is_constexpr:
                 const_args.append(val)
             elif p.do_not_specialize:
-                dns_args.append(val)
+                dns_key.append(dns_arg_key(val))
                 k_args.append(val)
             else:
-                spec_args.append(val)
+                spec_key.append(spec_arg_key(val))
                 k_args.append(val)
 
-        entry_key = self.key(spec_args, dns_args, const_args)
+        entry_key = self.key(spec_key, dns_key, const_args)
         device = torch_device_fn.current_device()
         cache = self.kernel_cache[device]
-        while entry_key not in cache:
+        # fast path: a single lookup without locking, dict reads are atomic
+        cached = cache.get(entry_key)
+        if cached is None:
             # NOTE: we serialize the first run of a jit function regardless of which device to run on
             # because Triton runtime is currently not threadsafe.
             with self.lock:
-                if entry_key in cache:
-                    break
-                kernel = self.fn.run(*args, **kwargs)
-                fn = self.fn
-                # collect constexpr arguments for grid computation
-                constexprs = {}
-                while not isinstance(fn, triton.runtime.JITFunction):
-                    if isinstance(fn, triton.runtime.Autotuner):
-                        config = fn.best_config
-                        constexprs["num_warps"] = config.num_warps
-                        constexprs["num_stages"] = config.num_stages
-                        constexprs["num_ctas"] = config.num_ctas
-                        constexprs = {**constexprs, **config.kwargs}
-                    elif isinstance(fn, triton.runtime.Heuristics):
-                        for v, heur in fn.values.items():
-                            constexprs[v] = heur(
-                                {
-                                    **dict(zip(fn.arg_names, args)),
-                                    **kwargs,
-                                    **constexprs,
-                                }
-                            )
-                    else:
-                        raise RuntimeError("Invalid Runtime Function")
-                    fn = fn.fn
-                for p in self.jit_function.params:
-                    if (
-                        p.is_constexpr
-                        and p.name not in constexprs
-                        and (p.default is not inspect._empty)
-                    ):
-                        constexprs[p.name] = p.default
-                cache[entry_key] = (kernel, constexprs)
-            return kernel, constexprs
-
-        kernel, constexprs = cache[entry_key]
+                # another thread may have compiled it while we were waiting
+                cached = cache.get(entry_key)
+                if cached is None:
+                    kernel = self.fn.run(*args, **kwargs)
+                    constexprs = self.collect_constexprs(args, kwargs)
+                    cache[entry_key] = (kernel, constexprs)
+                    return kernel, constexprs
+
+        kernel, constexprs = cached
 
         if callable(grid):
             # collect all arguments to the grid fn，ie:
@@ -2,6 +2,7 @@ import pytest
 import torch
 
 import flag_gems
+from flag_gems.ops.addmm import HAS_TMA_DESCRIPTOR, use_persistent_tma
 
 from .accuracy_utils import (
     FLOAT_DTYPES,
@@ -16,19 +17,23 @@ MN_SHAPES = [(1, 32)] if QUICK_MODE else [(1, 32), (160, 1024), (5333, 497)]
 MNK_SHAPES = (
     [(1, 1, 32)] if QUICK_MODE else [(1, 1, 32), (15, 160, 1024), (495, 5333, 71)]
 )
+# skinny outputs with a long reduction take the split-k path of addmm
+ADDMM_SHAPES = MNK_SHAPES if QUICK_MODE else MNK_SHAPES + [(16, 64, 4096)]
 FLOAT_DTYPES = [torch.float32] if QUICK_MODE else FLOAT_DTYPES
 
 
 @pytest.mark.addmm
 @pytest.mark.linear
 @pytest.mark.matmul
-@pytest.mark.parametrize("M, N, K", MNK_SHAPES)
+@pytest.mark.parametrize("M, N, K", ADDMM_SHAPES)
 @pytest.mark.parametrize("scalar", SCALARS)
 @pytest.mark.parametrize("dtype", FLOAT_DTYPES)
-def test_accuracy_addmm(M, N, K, scalar, dtype):
+@pytest.mark.parametrize("bias_shape", ["N", "0-dim", "1xN", "MxN"])
+def test_accuracy_addmm(M, N, K, scalar, dtype, bias_shape):
     mat1 = torch.randn((M, K), dtype=dtype, device=flag_gems.device)
     mat2 = torch.randn((K, N), dtype=dtype, device=flag_gems.device)
-    bias = torch.randn((N,), dtype=dtype, device=flag_gems.device)
+    shape = {"N": (N,), "0-dim": (), "1xN": (1, N), "MxN": (M, N)}[bias_shape]
+    bias = torch.randn(shape, dtype=dtype, device=flag_gems.device)
     ref_mat1 = to_reference(mat1, True)
     ref_mat2 = to_reference(mat2, True)
     ref_bias = to_reference(bias, True)
@@ -42,6 +47,165 @@ def test_accuracy_addmm(M, N, K, scalar, dtype):
     gems_assert_close(res_out, ref_out, dtype, reduce_dim=K)
 
 
+@pytest.mark.addmm
+@pytest.mark.parametrize("M, N, K", ADDMM_SHAPES)
+@pytest.mark.parametrize("alpha, beta", [(0.0, 1.5), (1.5, 0.0)])
+@pytest.mark.parametrize("dtype", FLOAT_DTYPES)
+def test_accuracy_addmm_zero_scalar(M, N, K, alpha, beta, dtype):
+    mat1 = torch.randn((M, K), dtype=dtype, device=flag_gems.device)
+    mat2 = torch.randn((K, N), dtype=dtype, device=flag_gems.device)
+    bias = torch.randn((N,), dtype=dtype, device=flag_gems.device)
+    ref_mat1 = to_reference(mat1, True)
+    ref_mat2 = to_reference(mat2, True)
+    ref_bias = to_reference(bias, True)
+
+    ref_out = torch.addmm(ref_bias, ref_mat1, ref_mat2, alpha=alpha, beta=beta)
+    with flag_gems.use_gems():
+        res_out = torch.addmm(bias, mat1, mat2, alpha=alpha, beta=beta)
+
+    gems_assert_close(res_out, ref_out, dtype, reduce_dim=K)
+
+
+@pytest.mark.addmm
+@pytest.mark.parametrize("M, N, K", ADDMM_SHAPES)
+def test_accuracy_addmm_tiny_alpha(M, N, K):
+    # beta / alpha overflows fp32 while both terms of the result stay finite
+    dtype = torch.float32
+    alpha, beta = 1e-30, 1e9
+    mat1 = torch.randn((M, K), dtype=dtype, device=flag_gems.device)
+    mat2 = torch.randn((K, N), dtype=dtype, device=flag_gems.device)
+    bias = torch.randn((N,), dtype=dtype, device=flag_gems.device)
+    bias[0] = 0
+    ref_mat1 = to_reference(mat1, True)
+    ref_mat2 = to_reference(mat2, True)
+    ref_bias = to_reference(bias, True)
+
+    ref_out = torch.addmm(ref_bias, ref_mat1, ref_mat2, alpha=alpha, beta=beta)
+    with flag_gems.use_gems():
+        res_out = torch.addmm(bias, mat1, mat2, alpha=alpha, beta=beta)
+
+    gems_assert_close(res_out, ref_out, dtype, reduce_dim=K)
+
+
+@pytest.mark.addmm
+@pytest.mark.parametrize("M, N, K", MNK_SHAPES)
+@pytest.mark.parametrize("dtype", FLOAT_DTYPES)
+def test_accuracy_addmm_transposed(M, N, K, dtype):
+    mat1 = torch.randn((K, M), dtype=dtype, device=flag_gems.device).t()
+    mat2 = torch.randn((N, K), dtype=dtype, device=flag_gems.device).t()
+    bias = torch.randn((N,), dtype=dtype, device=flag_gems.device)
+    ref_mat1 = to_reference(mat1, True)
+    ref_mat2 = to_reference(mat2, True)
+    ref_bias = to_reference(bias, True)
+
+    ref_out = torch.addmm(ref_bias, ref_mat1, ref_mat2)
+    with flag_gems.use_gems():
+        res_out = torch.addmm(bias, mat1, mat2)
+
+    gems_assert_close(res_out, ref_out, dtype, reduce_dim=K)
+
+
+@pytest.mark.skipif(flag_gems.vendor_name != "nvidia", reason="tf32 is nvidia only")
+@pytest.mark.addmm
+@pytest.mark.parametrize("M, N, K", ADDMM_SHAPES)
+def test_accuracy_addmm_tf32x3(M, N, K):
+    dtype = torch.float32
+    mat1 = torch.randn((M, K), dtype=dtype, device=flag_gems.device)
+    mat2 = torch.randn((K, N), dtype=dtype, device=flag_gems.device)
+    bias = torch.randn((N,), dtype=dtype, device=flag_gems.device)
+    ref_mat1 = to_reference(mat1, True)
+    ref_mat2 = to_reference(mat2, True)
+    ref_bias = to_reference(bias, True)
+
+    ref_out = torch.addmm(ref_bias, ref_mat1, ref_mat2)
+    # "high" selects the 3xTF32 path of the fp32 kernels
+    prev = torch.get_float32_matmul_precision()
+    torch.set_float32_matmul_precision("high")
+    try:
+        with flag_gems.use_gems():
+            res_out = torch.addmm(bias, mat1, mat2)
+    finally:
+        torch.set_float32_matmul_precision(prev)
+
+    gems_assert_close(res_out, ref_out, dtype, reduce_dim=K)
+
+
+@pytest.mark.addmm_relu
+@pytest.mark.addmm_gelu
+@pytest.mark.parametrize("M, N, K", ADDMM_SHAPES)
+@pytest.mark.parametrize("activation", ["relu", "gelu"])
+@pytest.mark.parametrize("dtype", FLOAT_DTYPES)
+def test_accuracy_addmm_activation(M, N, K, activation, dtype):
+    mat1 = torch.randn((M, K), dtype=dtype, device=flag_gems.device)
+    mat2 = torch.randn((K, N), dtype=dtype, device=flag_gems.device)
+    bias = torch.randn((N,), dtype=dtype, device=flag_gems.device)
+    ref_mat1 = to_reference(mat1, True)
+    ref_mat2 = to_reference(mat2, True)
+    ref_bias = to_reference(bias, True)
+
+    ref_out = torch.addmm(ref_bias, ref_mat1, ref_mat2)
+    if activation == "relu":
+        ref_out = torch.relu(ref_out)
+        res_out = flag_gems.addmm_relu(bias, mat1, mat2)
+    else:
+        ref_out = torch.nn.functional.gelu(ref_out, approximate="tanh")
+        res_out = flag_gems.addmm_gelu(bias, mat1, mat2)
+
+    gems_assert_close(res_out, ref_out, dtype, reduce_dim=K)
+
+
+@pytest.mark.skipif(flag_gems.vendor_name != "nvidia", reason="TMA is nvidia only")
+@pytest.mark.addmm
+@pytest.mark.parametrize("dtype", FLOAT_DTYPES)
+def test_accuracy_addmm_persistent_tma(dtype):
+    if torch.cuda.get_device_capability() < (9, 0):
+        pytest.skip("TMA requires hopper or newer")
+    if not HAS_TMA_DESCRIPTOR:
+        pytest.skip("this triton has no host side TMA descriptors")
+    # enough tiles to fill the SMs, ragged against the persistent tile along
+    # every dim, with row pitches that keep TMA's 16-byte alignment
+    M, N, K = 1999, 3000, 1000
+    mat1 = torch.randn((M, K), dtype=dtype, device=flag_gems.device)
+    mat2 = torch.randn((K, N), dtype=dtype, device=flag_gems.device)
+    bias = torch.randn((N,), dtype=dtype, device=flag_gems.device)
+    assert use_persistent_tma(bias, mat1, mat2)
+    ref_mat1 = to_reference(mat1, True)
+    ref_mat2 = to_reference(mat2, True)
+    ref_bias = to_reference(bias, True)
+
+    ref_out = torch.addmm(ref_bias, ref_mat1, ref_mat2)
+    with flag_gems.use_gems():
+        res_out = torch.addmm(bias, mat1, mat2)
+
+    gems_assert_close(res_out, ref_out, dtype, reduce_dim=K)
+
+
+@pytest.mark.addmm
+@pytest.mark.parametrize("layout", ["sliced", "expanded"])
+@pytest.mark.parametrize("dtype", FLOAT_DTYPES)
+def test_accuracy_addmm_strided_operands(layout, dtype):
+    # the shape of test_accuracy_addmm_persistent_tma, with operands whose row
+    # pitch is not their width, which the TMA descriptors cannot express
+    M, N, K = 1999, 3000, 1000
+    if layout == "sliced":
+        mat1 = torch.randn((M, K + 8), dtype=dtype, device=flag_gems.device)[:, :K]
+        mat2 = torch.randn((K, N + 8), dtype=dtype, device=flag_gems.device)[:, :N]
+    else:
+        mat1 = torch.randn((1, K), dtype=dtype, device=flag_gems.device).expand(M, K)
+        mat2 = torch.randn((1, N), dtype=dtype, device=flag_gems.device).expand(K, N)
+    bias = torch.randn((N,), dtype=dtype, device=flag_gems.device)
+    assert not use_persistent_tma(bias.broadcast_to((M, N)), mat1, mat2)
+    ref_mat1 = to_reference(mat1, True)
+    ref_mat2 = to_reference(mat2, True)
+    ref_bias = to_reference(bias, True)
+
+    ref_out = torch.addmm(ref_bias, ref_mat1, ref_mat2)
+    with flag_gems.use_gems():
+        res_out = torch.addmm(bias, mat1, mat2)
+
+    gems_assert_close(res_out, ref_out, dtype, reduce_dim=K)
+
+
 @pytest.mark.bmm
 @pytest.mark.parametrize("M, N, K", MNK_SHAPES)
 @pytest.mark.parametrize("dtype", FLOAT_DTYPES)
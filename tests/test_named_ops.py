@@ -10,7 +10,17 @@ import flag_gems
 
 blas_ops_ut_map = {
     "linear": ("test_accuracy_addmm",),
-    "addmm": ("test_accuracy_addmm",),
+    "addmm": (
+        "test_accuracy_addmm",
+        "test_accuracy_addmm_zero_scalar",
+        "test_accuracy_addmm_tiny_alpha",
+        "test_accuracy_addmm_transposed",
+        "test_accuracy_addmm_tf32x3",
+        "test_accuracy_addmm_persistent_tma",
+        "test_accuracy_addmm_strided_operands",
+    ),
+    "addmm_relu": ("test_accuracy_addmm_activation",),
+    "addmm_gelu": ("test_accuracy_addmm_activation",),
     "bmm": ("test_accuracy_bmm",),
     "mv": ("test_accuracy_mv",),
     "mm": ("test_accuracy_mm",),